@@ -1,219 +1,430 @@
+import re
 import time
-import json
+import base64
+import queue
+import hashlib
 import logging
+import math
+import itertools
+import threading
+from urllib.parse import urlparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-import html2text
-from bs4 import BeautifulSoup
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+import orjson
+from html_to_markdown import ConversionOptions, convert
+from selectolax.lexbor import LexborHTMLParser
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
+# Subresources the scraper never reads, blocked unless assets are requested
+BLOCKED_ASSET_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.css"
+]
 
-def configure_driver(headless=True):
+# Converter settings are built once; links, images and emphasis are kept and
+# lines are not wrapped
+MARKDOWN_OPTIONS = ConversionOptions(heading_style="atx", extract_metadata=False)
+
+# Collapse blank lines and reduce "###" headings to "##" in a single pass
+_MARKDOWN_TIDY_RE = re.compile(r"\n{2,}|###")
+
+
+def _tidy_markdown_match(match):
+    """Return the replacement for a single _MARKDOWN_TIDY_RE match."""
+    return "##" if match.group() == "###" else "\n"
+
+
+def configure_driver(headless=True, load_assets=False):
     """Configure and return a Selenium WebDriver."""
     options = Options()
-    options.headless = headless
+    if headless:
+        options.add_argument("--headless=new")
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_argument("--disable-popup-blocking")
     options.add_argument("--start-maximized")
-    return webdriver.Chrome(options=options)
+    if not load_assets:
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.stylesheets": 2
+        })
+    driver = webdriver.Chrome(options=options)
+
+    if not load_assets:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_ASSET_URLS})
+        except Exception as e:
+            logger.warning("Error blocking asset URLs: %s", e)
+    return driver
+
+
+def reset_driver(driver):
+    """Clear cache, cookies and the current page so a driver can be reused."""
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        # Unlike delete_all_cookies(), this also clears subdomain and third-party cookies
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.get("about:blank")
+    except Exception as e:
+        logger.warning("Error resetting driver: %s", e)
+
+
+class DriverPool:
+    """Keep a fixed number of Chrome drivers alive and hand them out for reuse."""
+
+    def __init__(self, size=1, headless=True, load_assets=False):
+        self.load_assets = load_assets
+        self._drivers = []
+        self._idle = queue.Queue()
+        try:
+            for _ in range(size):
+                driver = configure_driver(headless=headless, load_assets=load_assets)
+                self._drivers.append(driver)
+                self._idle.put(driver)
+        except Exception:
+            # Don't leak the drivers that did start
+            self.close()
+            raise
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a driver, resetting it before it goes back to the pool."""
+        driver = self._idle.get()
+        try:
+            yield driver
+        finally:
+            reset_driver(driver)
+            self._idle.put(driver)
+
+    def close(self):
+        """Quit every driver owned by the pool."""
+        for driver in self._drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning("Error quitting driver: %s", e)
+        self._drivers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 def dynamic_scroll(driver, timeout=10):
     """Perform dynamic scrolling to load all content."""
     logger.info("Starting dynamic scrolling...")
-    scroll_pause_time = 1
+    # Start with a short pause so static pages finish quickly, and grow it
+    # towards max_pause while the page keeps growing (lazy loading). An
+    # unchanged height gets a couple of short retries before giving up, so a
+    # static page idles well under the old fixed 1 s.
+    min_pause, max_pause, max_idle_retries = 0.1, 1.0, 2
+    pause, idle_retries = min_pause, 0
     last_height = driver.execute_script("return document.body.scrollHeight")
 
+    def grown_height(d):
+        height = d.execute_script("return document.body.scrollHeight")
+        return height if height != last_height else False
+
     start_time = time.time()
     while time.time() - start_time < timeout:
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(scroll_pause_time)
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
+        wait = pause if idle_retries == 0 else min_pause
+        try:
+            # Return as soon as the page grows instead of sleeping the whole pause
+            last_height = WebDriverWait(driver, wait, poll_frequency=0.05).until(grown_height)
+        except TimeoutException:
+            if idle_retries >= max_idle_retries:
+                break
+            idle_retries += 1
+            continue
+        idle_retries = 0
+        pause = min(pause * 1.5, max_pause)
+
+
+# Collect every metadata field in a single WebDriver round-trip
+METADATA_SCRIPT = """
+const q = s => document.querySelector(s);
+return {
+    title: document.title,
+    description: q("meta[name='description']")?.getAttribute("content") ?? null,
+    author: q("meta[name='author']")?.getAttribute("content") ?? null,
+    keywords: q("meta[name='keywords']")?.getAttribute("content") ?? null,
+    language: document.documentElement.getAttribute("lang"),
+    canonicalUrl: location.href
+};
+"""
 
 
 def extract_metadata(driver):
     """Extract metadata like title, description, and author."""
     logger.info("Extracting metadata...")
-    metadata = {}
     try:
-        metadata['title'] = driver.title
+        return driver.execute_script(METADATA_SCRIPT)
     except Exception as e:
-        logger.warning(f"Error extracting title: {e}")
-        metadata['title'] = None
-
-    meta_tags = {
-        'description': "//meta[@name='description']",
-        'author': "//meta[@name='author']",
-        'keywords': "//meta[@name='keywords']"
-    }
-
-    for key, xpath in meta_tags.items():
-        try:
-            metadata[key] = driver.find_element(By.XPATH, xpath).get_attribute('content')
-        except Exception:
-            metadata[key] = None
-
-    try:
-        metadata['language'] = driver.find_element(By.XPATH, "//html").get_attribute('lang')
-    except Exception:
-        metadata['language'] = None
-
-    metadata['canonicalUrl'] = driver.current_url
-    return metadata
+        logger.warning("Error extracting metadata: %s", e)
+        return {
+            'title': None,
+            'description': None,
+            'author': None,
+            'keywords': None,
+            'language': None,
+            'canonicalUrl': driver.current_url
+        }
 
 
 def remove_unnecessary_elements(driver):
     """Remove unwanted elements like ads, navigation bars, and modals."""
     logger.info("Removing unnecessary elements...")
     elements_to_remove = [
-        "//header", "//footer", "//nav",
-        "//div[contains(@class, 'ads')]",
-        "//div[contains(@class, 'modal')]",
-        "//div[contains(@id, 'cookie')]"
+        "header", "footer", "nav",
+        "div[class*='ads']",
+        "div[class*='modal']",
+        "div[id*='cookie']"
     ]
-    for xpath in elements_to_remove:
-        try:
-            elements = driver.find_elements(By.XPATH, xpath)
-            for element in elements:
-                driver.execute_script("arguments[0].remove();", element)
-        except Exception as e:
-            logger.warning(f"Error removing elements with xpath '{xpath}': {e}")
+    # Remove every match inside the browser in a single round-trip
+    try:
+        driver.execute_script(
+            "document.querySelectorAll(arguments[0]).forEach(e => e.remove());",
+            ", ".join(elements_to_remove)
+        )
+    except Exception as e:
+        logger.warning("Error removing unnecessary elements: %s", e)
 
 
 def capture_screenshot(driver, output_path="screenshot.png"):
     """Capture and save a screenshot of the current webpage."""
     try:
-        driver.save_screenshot(output_path)
-        logger.info(f"Screenshot saved to {output_path}")
+        result = driver.execute_cdp_cmd("Page.captureScreenshot", {"format": "png", "captureBeyondViewport": True})
+        with open(output_path, "wb") as file:
+            file.write(base64.b64decode(result["data"]))
+        logger.info("Screenshot saved to %s", output_path)
         return output_path
     except Exception as e:
-        logger.warning(f"Error capturing screenshot: {e}")
+        logger.warning("Error capturing screenshot: %s", e)
         return None
 
 
-def extract_main_content(html_content):
-    """Extract the main content from the HTML using BeautifulSoup."""
-    soup = BeautifulSoup(html_content, "html.parser")
+def get_page_source(driver):
+    """Return the current document's HTML straight from the DevTools protocol."""
+    try:
+        # depth 0 is enough to get the root node id without serializing the whole DOM tree
+        root = driver.execute_cdp_cmd("DOM.getDocument", {"depth": 0})["root"]["nodeId"]
+        return driver.execute_cdp_cmd("DOM.getOuterHTML", {"nodeId": root})["outerHTML"]
+    except Exception as e:
+        logger.warning("Error reading page source over CDP, falling back to WebDriver: %s", e)
+        return driver.page_source
+
 
-    # Try to find the main content area
-    main_content = soup.find("main") or soup.find("article")
-    if not main_content:
-        # Fallback to body content if <main> or <article> is not present
-        main_content = soup.find("body")
+def build_clean_tree(html_content):
+    """Parse HTML once with selectolax, strip boilerplate and locate the main content."""
+    tree = LexborHTMLParser(html_content)
 
-    # Remove unwanted elements
-    for tag in main_content.find_all(["header", "footer", "nav", "script", "style", "aside", "form"]):
-        tag.decompose()
+    # Remove unnecessary elements .......!
+    tree.strip_tags(["header", "footer", "nav", "aside", "script", "style"])
 
-    # Optionally remove comments
-    for comment in main_content.find_all(string=lambda text: isinstance(text, BeautifulSoup.Comment)):
-        comment.extract()
+    # Try to find the main content area, falling back to the body
+    main_content = tree.css_first("main") or tree.css_first("article") or tree.body
 
-    return str(main_content)
+    return tree, main_content
 
 
-def convert_html_to_markdown_precise(html_content):
-    """Convert cleaned HTML content to precise Markdown format."""
+def convert_html_to_markdown_precise(main_content):
+    """Convert the main content node of a cleaned tree to precise Markdown format."""
     logger.info("Converting HTML to Markdown (Enhanced)...")
-    converter = html2text.HTML2Text()
-    converter.ignore_links = False
-    converter.ignore_images = False
-    converter.ignore_emphasis = False
-    converter.body_width = 0
 
-    # Extract main content for better accuracy
-    main_content = extract_main_content(html_content)
-    markdown = converter.handle(main_content)
+    # Remove unwanted elements; inline <svg> would otherwise be emitted as a
+    # base64 data-URI image. Comments need no pass of their own since the
+    # converter drops comment nodes while walking the tree
+    main_content.strip_tags(["form", "svg"])
+
+    # Serialize the in-place cleaned node exactly once for the converter
+    markdown = convert(main_content.html, MARKDOWN_OPTIONS).content
 
     # Additional formatting for better readability
-    formatted_markdown = (
-        markdown.replace("\n\n", "\n")  # Remove excessive newlines
-        .replace("###", "##")  # Reduce excessive heading levels
-        .strip()
-    )
+    markdown = _MARKDOWN_TIDY_RE.sub(_tidy_markdown_match, markdown).strip()
 
     logger.info("Markdown conversion complete.")
-    return formatted_markdown
-
-
-def parse_clean_html(html_content):
-    """Parse and clean HTML using BeautifulSoup."""
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    # Remove unnecessary elements .......!
-    for tag in soup(["header", "footer", "nav", "aside", "script", "style"]):
-        tag.decompose()
-
-    return str(soup)
+    return markdown
 
 
 def save_content(content, filename):
-    """Save content to a file."""
+    """Save content to a file and return its path, or None if it failed."""
     try:
         with open(filename, "w", encoding="utf-8") as file:
             file.write(content)
-        logger.info(f"Content saved to {filename}")
+        logger.info("Content saved to %s", filename)
+        return filename
     except Exception as e:
-        logger.error(f"Failed to save content to {filename}: {e}")
+        logger.error("Failed to save content to %s: %s", filename, e)
+        return None
 
 
-def crawl_website(url, timeout=10):
-    """Main function to crawl a website and extract structured data."""
-    driver = configure_driver()
+def append_jsonl(record, filename):
+    """Append a single record to a JSON Lines file."""
     try:
-        driver.get(url)
-        logger.info(f"Loaded URL: {url}")
-        dynamic_scroll(driver, timeout=timeout)
-
-        # Here Remove unwanted elements for cleaner output
-        remove_unnecessary_elements(driver)
-
-        # Here I Extract metadata
-        metadata = extract_metadata(driver)
-
-        # Extract full HTML and convert to precise Markdown.....................................................................................................
-        html_content = driver.page_source
-        clean_html = parse_clean_html(html_content)
-        markdown_content = convert_html_to_markdown_precise(clean_html)
-
-        # Extract plain text content
-        text_content = driver.find_element(By.TAG_NAME, 'body').text
-
-        # Capture a screenshot of the webpage
-        screenshot_path = capture_screenshot(driver)
-
-        # Save content in fromat
-        save_content(clean_html, "content.html")  # Save cleaned HTML
-        save_content(markdown_content, "content.md")  # Save precise Markdown
-        save_content(text_content.strip(), "content.txt")  # Save plain text
-
-        # crawl data
-        crawl_data = {
-            "url": url,
-            "crawl": {
-                "loadedUrl": driver.current_url,
-                "loadedTime": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
-                "referrerUrl": driver.current_url,
-                "depth": 0
-            },
-            "metadata": metadata,
-            "screenshotUrl": screenshot_path,
-            "text": text_content.strip(),
-            "html": clean_html,
-            "markdown": markdown_content.strip()
-        }
+        with open(filename, "ab") as file:
+            file.write(orjson.dumps(record) + b"\n")
+    except Exception as e:
+        logger.error("Failed to append record to %s: %s", filename, e)
+
+
+def url_suffix(url):
+    """Return a short, filename-safe suffix that is unique per URL."""
+    return "_" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+
+def crawl_one(driver, url, timeout=10, suffix="", screenshot=True):
+    """Crawl a single URL with an already running driver and extract structured data."""
+    driver.get(url)
+    WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    logger.info("Loaded URL: %s", url)
+    dynamic_scroll(driver, timeout=timeout)
+
+    # Here Remove unwanted elements for cleaner output
+    remove_unnecessary_elements(driver)
+
+    # Here I Extract metadata
+    metadata = extract_metadata(driver)
+
+    # Extract full HTML and convert to precise Markdown.....................................................................................................
+    # Parse the page once and share the tree between the saved HTML and Markdown
+    tree, main_content = build_clean_tree(get_page_source(driver))
+    clean_html = tree.html
+
+    # Extract plain text content locally before the Markdown step trims the tree
+    text_content = tree.body.text(separator="\n", strip=True).strip()
+
+    markdown_content = convert_html_to_markdown_precise(main_content)
+
+    # Capture a screenshot of the webpage
+    screenshot_path = capture_screenshot(driver, f"screenshot{suffix}.png") if screenshot else None
+
+    # Save content in fromat; the crawl data only references these files
+    html_path = save_content(clean_html, f"content{suffix}.html")  # Save cleaned HTML
+    markdown_path = save_content(markdown_content, f"content{suffix}.md")  # Save precise Markdown
+    text_path = save_content(text_content, f"content{suffix}.txt")  # Save plain text
+
+    # crawl data
+    loaded_url = driver.current_url
+    crawl_data = {
+        "url": url,
+        "crawl": {
+            "loadedUrl": loaded_url,
+            "loadedTime": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "referrerUrl": loaded_url,
+            "depth": 0
+        },
+        "metadata": metadata,
+        "screenshotUrl": screenshot_path,
+        "textPath": text_path,
+        "htmlPath": html_path,
+        "markdownPath": markdown_path
+    }
 
-        return crawl_data
-    finally:
-        driver.quit()
+    return crawl_data
+
+
+def resolve_load_assets(screenshot, load_assets):
+    """Load page assets whenever a screenshot is wanted, unless told otherwise."""
+    if load_assets is None:
+        return screenshot
+    if screenshot and not load_assets:
+        logger.warning("Taking screenshots with images, fonts and CSS blocked; they will look unstyled")
+    return load_assets
+
+
+def crawl_website(url, timeout=10, pool=None, suffix="", screenshot=True, load_assets=None):
+    """Main function to crawl a website and extract structured data.
+
+    Images, fonts and stylesheets are only loaded when a screenshot is taken,
+    unless load_assets says otherwise; it only applies when no pool is passed
+    in, as pooled drivers are configured when the pool is created.
+    """
+    if pool is None:
+        with DriverPool(size=1, load_assets=resolve_load_assets(screenshot, load_assets)) as pool:
+            with pool.acquire() as driver:
+                return crawl_one(driver, url, timeout=timeout, suffix=suffix, screenshot=screenshot)
+
+    if screenshot and not pool.load_assets:
+        logger.warning("Taking screenshots with images, fonts and CSS blocked; they will look unstyled")
+    with pool.acquire() as driver:
+        return crawl_one(driver, url, timeout=timeout, suffix=suffix, screenshot=screenshot)
+
+
+def batch_by_host(urls, max_batch_size=100, workers=1):
+    """Group (index, url) pairs by host, splitting groups larger than max_batch_size.
+
+    Each host group is also split into up to `workers` chunks so that a
+    single-host crawl still keeps every worker busy.
+    """
+    def host(item):
+        return urlparse(item[1]).netloc
+
+    batches = []
+    for _, group in itertools.groupby(sorted(enumerate(urls), key=host), key=host):
+        group = list(group)
+        batch_size = max(1, min(max_batch_size, math.ceil(len(group) / workers)))
+        for start in range(0, len(group), batch_size):
+            batches.append(group[start:start + batch_size])
+    return batches
+
+
+def crawl_many(urls, workers=8, timeout=10, screenshot=True, load_assets=None, output_file=None,
+               max_batch_size=100):
+    """Crawl several URLs concurrently, one headless driver per worker thread.
+
+    URLs on the same host are crawled back to back on one driver so its
+    connections, DNS cache and JS engine stay warm; each host is split over
+    up to `workers` batches, capped at max_batch_size to bound driver memory
+    growth. Results keep the input order, and when output_file is given each
+    one is appended to it as a JSON line as soon as it is crawled.
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    load_assets = resolve_load_assets(screenshot, load_assets)
+    batches = batch_by_host(urls, max_batch_size=max_batch_size, workers=max(1, workers))
+    workers = max(1, min(workers, len(batches)))
+
+    output_lock = threading.Lock()
+
+    def crawl(batch):
+        batch_results = []
+        # The driver is only reset once the whole host batch is done
+        with pool.acquire() as driver:
+            for index, url in batch:
+                try:
+                    crawl_data = crawl_one(
+                        driver, url, timeout=timeout, suffix=url_suffix(url), screenshot=screenshot
+                    )
+                except Exception as e:
+                    logger.error("Failed to crawl %s: %s", url, e)
+                    crawl_data = None
+                if output_file and crawl_data is not None:
+                    with output_lock:
+                        append_jsonl(crawl_data, output_file)
+                batch_results.append((index, crawl_data))
+        return batch_results
+
+    results = [None] * len(urls)
+    # The executor is shut down before the pool, so no driver quits mid-crawl
+    with DriverPool(size=workers, load_assets=load_assets) as pool, ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch_results in executor.map(crawl, batches):
+            for index, crawl_data in batch_results:
+                results[index] = crawl_data
+    return results
 
 
 if __name__ == "__main__":
@@ -223,9 +434,9 @@ if __name__ == "__main__":
 
        
         output_file = "result.json"
-        with open(output_file, "w", encoding="utf-8") as file:
-            json.dump(crawl_data, file, indent=2)
-        logger.info(f"Result saved to {output_file}")
+        with open(output_file, "wb") as file:
+            file.write(orjson.dumps(crawl_data, option=orjson.OPT_INDENT_2))
+        logger.info("Result saved to %s", output_file)
 
     except Exception as e:
-        logger.error(f"Failed to crawl website: {e}")
+        logger.error("Failed to crawl website: %s", e)